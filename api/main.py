@@ -6,6 +6,7 @@ Called by n8n, WhatsApp handler, web portal, or anything else.
 
 Endpoints:
   POST /convert     — image → FDA label (JSON + HTML + PDF)
+  POST /convert/batch — several images → one result per image, processed concurrently
   POST /audit       — image → compliance report (JSON)
   GET  /health      — uptime check for deployment monitoring
 
@@ -14,19 +15,27 @@ Auth: API key in header  X-API-Key: your_secret_key
 
 import os
 import re
+import math
+import asyncio
 import json
 import base64
 import logging
 from io import BytesIO
+from functools import lru_cache
 from typing import Dict, List, Tuple, Optional
 
-import openai
+from openai import AsyncOpenAI, OpenAIError
 from fastapi import FastAPI, File, UploadFile, Header, HTTPException, Depends
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import weasyprint
 
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json is the fallback
+    orjson = None
+
 # ============================================================================
 # APP SETUP
 # ============================================================================
@@ -54,8 +63,21 @@ app.add_middleware(
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "")
 VERILABEL_API_KEY = os.environ.get("VERILABEL_API_KEY", "changeme-set-this-in-env")
 MODEL = "gpt-4o"
+# Max vision calls in flight at once (per process) — keeps batches under rate limits
+OPENAI_CONCURRENCY = int(os.environ.get("OPENAI_CONCURRENCY", "8"))
+# Per-request timeout (seconds) and retries on connection errors, 429s and 5xx
+OPENAI_TIMEOUT = float(os.environ.get("OPENAI_TIMEOUT", "60"))
+OPENAI_MAX_RETRIES = int(os.environ.get("OPENAI_MAX_RETRIES", "2"))
+MAX_BATCH_FILES = 20
+
+openai_semaphore = asyncio.Semaphore(OPENAI_CONCURRENCY)
 
-openai.api_key = OPENAI_API_KEY
+
+@lru_cache(maxsize=1)
+def get_openai_client() -> AsyncOpenAI:
+    """One shared async client (and connection pool) for the whole process.
+    Built on first use so the app still boots without OPENAI_API_KEY set."""
+    return AsyncOpenAI(api_key=OPENAI_API_KEY, timeout=OPENAI_TIMEOUT, max_retries=OPENAI_MAX_RETRIES)
 
 
 # ============================================================================
@@ -87,6 +109,13 @@ class ConversionResponse(BaseModel):
     missing_fields: List[str]      # Fields not on source label
 
 
+class BatchItem(BaseModel):
+    filename: Optional[str]
+    success: bool
+    result: Optional[ConversionResponse]
+    error: Optional[str]
+
+
 class AuditResponse(BaseModel):
     success: bool
     compliance_score: int
@@ -119,69 +148,118 @@ MEXICAN_VNR = {
 }
 
 
+_FAT_TYPES = frozenset({'total_fat', 'saturated_fat', 'trans_fat'})
+# <0.5 → 0, otherwise nearest whole unit
+_GRAM_NEAREST_TYPES = frozenset({'total_carb', 'fiber', 'total_sugars', 'added_sugars', 'protein',
+                                 'vitamin_d_mcg', 'calcium_mg', 'iron_mg', 'potassium_mg'})
+
+
+def _round_half_up(x: float) -> int:
+    """Nearest integer with .5 going up (FDA labels), not round()'s half-to-even.
+
+    x - floor(x) is exact, so 2.5 → 3 and 0.49999999999999994 → 0.
+    The API deploys without fda_compliance, so this duplicates
+    fda_compliance._round_half_up; change both together.
+    """
+    n = math.floor(x)
+    return n + 1 if x - n >= 0.5 else n
+
+
+# Display string for n half-grams; 0.5 <= val < 5 rounds to n in 1..10
+_HALF_STR = ('0', '0.5', '1', '1.5', '2', '2.5', '3', '3.5', '4', '4.5', '5')
+
+
 def apply_fda_rounding(value, nutrient_type: str) -> str:
+    """FDA rounding per 21 CFR 101.9(c); memoized, labels repeat the same small amounts."""
+    try:
+        return _round_for_label(value, nutrient_type)
+    except TypeError:
+        # Unhashable value (list/dict from a malformed extraction) → not a number
+        return "0"
+
+
+@lru_cache(maxsize=4096)
+def _round_for_label(value, nutrient_type: str) -> str:
     try:
         val = float(value)
     except (ValueError, TypeError):
         return "0"
 
-    if nutrient_type == 'calories':
-        if val < 5: return "0"
-        elif val <= 50: return str(int(round(val / 5) * 5))
-        else: return str(int(round(val / 10) * 10))
+    # Most common rule first: 9 of the label's 15 amounts use it
+    if nutrient_type in _GRAM_NEAREST_TYPES:
+        if val < 0.5: return "0"
+        return str(_round_half_up(val))
 
-    elif nutrient_type in ['total_fat', 'saturated_fat', 'trans_fat']:
+    elif nutrient_type in _FAT_TYPES:
         if val < 0.5: return "0"
-        elif val < 5:
-            rounded = round(val * 2) / 2
-            return str(int(rounded)) if rounded == int(rounded) else f"{rounded:.1f}"
-        else: return str(int(round(val)))
+        elif val < 5: return _HALF_STR[_round_half_up(val * 2)]
+        else: return str(_round_half_up(val))
 
     elif nutrient_type == 'cholesterol':
         if val < 2: return "0"
         elif val <= 5: return "5"
-        else: return str(int(round(val / 5) * 5))
+        else: return str(_round_half_up(val / 5) * 5)
 
     elif nutrient_type == 'sodium':
         if val < 5: return "0"
-        elif val <= 140: return str(int(round(val / 5) * 5))
-        else: return str(int(round(val / 10) * 10))
+        elif val <= 140: return str(_round_half_up(val / 5) * 5)
+        else: return str(_round_half_up(val / 10) * 10)
 
-    elif nutrient_type in ['total_carb', 'fiber', 'total_sugars', 'added_sugars', 'protein']:
-        if val < 0.5: return "0"
-        else: return str(int(round(val)))
-
-    elif nutrient_type in ['vitamin_d_mcg', 'calcium_mg', 'iron_mg', 'potassium_mg']:
-        if val < 0.5: return "0"
-        return str(int(round(val)))
+    elif nutrient_type == 'calories':
+        if val < 5: return "0"
+        elif val <= 50: return str(_round_half_up(val / 5) * 5)
+        else: return str(_round_half_up(val / 10) * 10)
 
-    return str(int(round(val)))
+    return str(_round_half_up(val))
 
 
+@lru_cache(maxsize=1024)
 def calculate_percent_dv(nutrient: str, amount: float) -> int:
     if nutrient not in FDA_DAILY_VALUES or FDA_DAILY_VALUES[nutrient] == 0:
         return 0
-    return round((amount / FDA_DAILY_VALUES[nutrient]) * 100)
+    return _round_half_up((amount / FDA_DAILY_VALUES[nutrient]) * 100)
 
 
-def calculate_all_dv(data: Dict) -> Dict:
-    mappings = {
-        'total_fat': 'total_fat_g', 'saturated_fat': 'saturated_fat_g',
-        'cholesterol': 'cholesterol_mg', 'sodium': 'sodium_mg',
-        'total_carb': 'total_carb_g', 'fiber': 'fiber_g',
-        'added_sugars': 'added_sugars_g', 'protein': 'protein_g',
-        'vitamin_d': 'vitamin_d_mcg', 'calcium': 'calcium_mg',
-        'iron': 'iron_mg', 'potassium': 'potassium_mg'
-    }
-    dv = {}
-    for nutrient, field in mappings.items():
-        try:
-            val = data.get(field)
-            amount = float(val) if val not in [None, '', 'null'] else 0
-            dv[nutrient] = calculate_percent_dv(nutrient, amount)
-        except (ValueError, TypeError):
-            dv[nutrient] = 0
-    return dv
+# (nutrient, field) pairs for %DV
+DV_FIELDS = (
+    ('total_fat', 'total_fat_g'), ('saturated_fat', 'saturated_fat_g'),
+    ('cholesterol', 'cholesterol_mg'), ('sodium', 'sodium_mg'),
+    ('total_carb', 'total_carb_g'), ('fiber', 'fiber_g'),
+    ('added_sugars', 'added_sugars_g'), ('protein', 'protein_g'),
+    ('vitamin_d', 'vitamin_d_mcg'), ('calcium', 'calcium_mg'),
+    ('iron', 'iron_mg'), ('potassium', 'potassium_mg'),
+)
+
+
+def calculate_all_dv(floats: Dict[str, float]) -> Dict:
+    """%DV for every nutrient from the amounts parsed by validate_numeric_values."""
+    return {nutrient: calculate_percent_dv(nutrient, floats[field]) for nutrient, field in DV_FIELDS}
+
+
+_SERVING_RE = re.compile(r'(\d+\.?\d*)\s*(g|ml)')
+
+# Serving sizes that are already household measures are passed through
+_SERVING_HOUSEHOLD_WORDS = ('cup', 'tbsp', 'tsp', 'oz', 'taza', 'cucharada', 'serving')
+
+# Common metric serving sizes (normalized: stripped, lowercase) → US display
+_SERVING_CONVERSIONS = {
+    '1g': '1/4 tsp (1g)', '2g': '1/2 tsp (2g)', '3g': '1 tsp (3g)',
+    '5g': '1 tsp (5g)', '15g': '1 tbsp (15g)', '28g': '1 oz (28g)',
+    '30g': '2 tbsp (30g)', '24g': '2 tbsp (24g)', '50g': '1/4 cup (50g)',
+    '100g': '3.5 oz (100g)', '240ml': '1 cup (240mL)', '250ml': '1 cup (250mL)',
+    '100ml': '3.4 fl oz (100mL)', '120ml': '1/2 cup (120mL)',
+    '15ml': '1 tbsp (15mL)', '5ml': '1 tsp (5mL)',
+    '355ml': '12 fl oz (355mL)', '500ml': '2 cups (500mL)',
+    '600ml': '20 fl oz (600mL)',
+}
+
+# Spanish household measures, applied in order ('tazas de té' before 'tazas')
+_HOUSEHOLD_TERMS = (
+    (re.compile(r'tazas? de té', re.IGNORECASE), 'cup of tea'),
+    (re.compile(r'tazas?', re.IGNORECASE), 'cup'),
+    (re.compile(r'cucharadas?', re.IGNORECASE), 'tbsp'),
+    (re.compile(r'cucharaditas?', re.IGNORECASE), 'tsp'),
+)
 
 
 def convert_metric_to_us_serving(metric_str: str) -> str:
@@ -190,23 +268,14 @@ def convert_metric_to_us_serving(metric_str: str) -> str:
     s = metric_str.strip().lower()
 
     # If already contains household measure, preserve it
-    if any(w in s for w in ['cup', 'tbsp', 'tsp', 'oz', 'taza', 'cucharada', 'serving']):
+    if any(w in s for w in _SERVING_HOUSEHOLD_WORDS):
         return metric_str
 
-    conversions = {
-        '1g': '1/4 tsp (1g)', '2g': '1/2 tsp (2g)', '3g': '1 tsp (3g)',
-        '5g': '1 tsp (5g)', '15g': '1 tbsp (15g)', '28g': '1 oz (28g)',
-        '30g': '2 tbsp (30g)', '24g': '2 tbsp (24g)', '50g': '1/4 cup (50g)',
-        '100g': '3.5 oz (100g)', '240ml': '1 cup (240mL)', '250ml': '1 cup (250mL)',
-        '100ml': '3.4 fl oz (100mL)', '120ml': '1/2 cup (120mL)',
-        '15ml': '1 tbsp (15mL)', '5ml': '1 tsp (5mL)',
-        '355ml': '12 fl oz (355mL)', '500ml': '2 cups (500mL)',
-        '600ml': '20 fl oz (600mL)',
-    }
-    if s in conversions:
-        return conversions[s]
+    converted = _SERVING_CONVERSIONS.get(s)
+    if converted is not None:
+        return converted
 
-    match = re.match(r'(\d+\.?\d*)\s*(g|ml)', s)
+    match = _SERVING_RE.match(s)
     if match:
         amount = float(match.group(1))
         unit = match.group(2)
@@ -236,10 +305,8 @@ def build_serving_size_display(data: Dict) -> str:
     # Translate Spanish household terms
     if original and any(c in original.lower() for c in ['taza', 'cucharada', 'cucharadita', '(']):
         translated = original
-        translated = re.sub(r'tazas? de té', 'cup of tea', translated, flags=re.IGNORECASE)
-        translated = re.sub(r'tazas?', 'cup', translated, flags=re.IGNORECASE)
-        translated = re.sub(r'cucharadas?', 'tbsp', translated, flags=re.IGNORECASE)
-        translated = re.sub(r'cucharaditas?', 'tsp', translated, flags=re.IGNORECASE)
+        for pattern, replacement in _HOUSEHOLD_TERMS:
+            translated = pattern.sub(replacement, translated)
         return translated
 
     if metric:
@@ -288,8 +355,13 @@ def resolve_servings_per_container(data: Dict) -> Tuple[str, Optional[str]]:
     return ('⚠ VERIFY', 'Servings not found on source label — enter manually before printing')
 
 
-def validate_numeric_values(data: Dict) -> Dict:
+def validate_numeric_values(data: Dict) -> Tuple[Dict, Dict[str, float]]:
+    """
+    Returns (corrected, floats): numeric fields normalized to strings, plus
+    the same amounts as floats (missing/invalid → 0.0) for the %DV step.
+    """
     corrected = data.copy()
+    floats = {}
 
     # Flatten nutrition_facts if nested
     if 'nutrition_facts' in data and isinstance(data['nutrition_facts'], dict):
@@ -315,19 +387,23 @@ def validate_numeric_values(data: Dict) -> Dict:
 
     for field in numeric_fields:
         val = corrected.get(field)
+        floats[field] = 0.0
         if val is None or str(val).strip() in ['', 'null', 'None']:
             corrected[field] = None if field in NULLABLE_FIELDS else '0'
         else:
             try:
-                fval = float(val)
-                corrected[field] = str(max(0, fval))
+                fval = max(0, float(val))
+                corrected[field] = str(fval)
+                floats[field] = float(fval)
             except (ValueError, TypeError):
                 corrected[field] = None if field in NULLABLE_FIELDS else '0'
 
-    return corrected
+    return corrected, floats
 
 
-def convert_mexican_vitamins(corrected: Dict, original: Dict) -> Tuple[Dict, List[str]]:
+def convert_mexican_vitamins(corrected: Dict, original: Dict,
+                             floats: Optional[Dict[str, float]] = None) -> Tuple[Dict, List[str]]:
+    """Fill calcium/iron/vitamin D from %VNR; keeps floats (if given) in step."""
     notes = []
     vnr_data = {}
 
@@ -351,12 +427,18 @@ def convert_mexican_vitamins(corrected: Dict, original: Dict) -> Tuple[Dict, Lis
             absolute = (pct / 100) * MEXICAN_VNR[nutrient]
             if nutrient == 'calcium':
                 corrected['calcium_mg'] = str(round(absolute, 1))
+                if floats is not None:
+                    floats['calcium_mg'] = round(absolute, 1)
                 notes.append(f"✓ Calcium: {pct}% VNR → {absolute:.1f}mg")
             elif nutrient == 'iron':
                 corrected['iron_mg'] = str(round(absolute, 1))
+                if floats is not None:
+                    floats['iron_mg'] = round(absolute, 1)
                 notes.append(f"✓ Iron: {pct}% VNR → {absolute:.1f}mg")
             elif nutrient == 'vitamin_d':
                 corrected['vitamin_d_mcg'] = str(round(absolute, 1))
+                if floats is not None:
+                    floats['vitamin_d_mcg'] = round(absolute, 1)
                 notes.append(f"✓ Vitamin D: {pct}% VNR → {absolute:.1f}mcg")
             else:
                 notes.append(f"✓ {nutrient}: {pct}% VNR → {absolute:.1f} (not required on FDA label)")
@@ -386,77 +468,9 @@ def get_missing_fields(data: Dict) -> List[str]:
 # HTML LABEL GENERATOR
 # ============================================================================
 
-def generate_fda_label_html(data: Dict, percent_dv: Dict,
-                             spc_display: str, spc_note: Optional[str],
-                             serving_size_display: str) -> str:
-
-    def val(key, default='0'):
-        v = data.get(key, default)
-        return v if v not in [None, '', 'null'] else default
-
-    def present(key):
-        return data.get(key) not in [None, 'null', 'None', '']
-
-    def dv(key):
-        return percent_dv.get(key, 0)
-
-    calories    = apply_fda_rounding(val('calories'), 'calories')
-    total_fat   = apply_fda_rounding(val('total_fat_g'), 'total_fat')
-    sat_fat     = apply_fda_rounding(val('saturated_fat_g'), 'saturated_fat')
-    cholesterol = apply_fda_rounding(val('cholesterol_mg'), 'cholesterol')
-    sodium      = apply_fda_rounding(val('sodium_mg'), 'sodium')
-    total_carb  = apply_fda_rounding(val('total_carb_g'), 'total_carb')
-    protein     = apply_fda_rounding(val('protein_g'), 'protein')
-    vitamin_d   = apply_fda_rounding(val('vitamin_d_mcg'), 'vitamin_d_mcg')
-    calcium     = apply_fda_rounding(val('calcium_mg'), 'calcium_mg')
-    iron        = apply_fda_rounding(val('iron_mg'), 'iron_mg')
-    potassium   = apply_fda_rounding(val('potassium_mg'), 'potassium_mg')
-
-    # Trans fat
-    trans_fat_row = ''
-    if present('trans_fat_g'):
-        tf = apply_fda_rounding(val('trans_fat_g'), 'trans_fat')
-        trans_fat_row = f'<div class="nr i1"><div class="nl"><span class="na"><em>Trans</em> Fat {tf}g</span></div><div class="ndv"></div></div><div class="bt"></div>'
-    else:
-        trans_fat_row = '<div class="nr i1"><div class="nl"><span class="na"><em>Trans</em> Fat ?g</span></div><div class="ndv"></div></div><div class="bt"></div>'
-
-    # Cholesterol
-    if present('cholesterol_mg'):
-        chol_row = f'<div class="nr"><div class="nl"><span class="nm">Cholesterol</span> <span class="na">{cholesterol}mg</span></div><div class="ndv">{dv("cholesterol")}%</div></div>'
-    else:
-        chol_row = '<div class="nr"><div class="nl"><span class="nm">Cholesterol</span> <span class="na">?mg</span></div><div class="ndv">?%</div></div>'
-
-    # Fiber
-    fiber_row = ''
-    if present('fiber_g'):
-        fiber = apply_fda_rounding(val('fiber_g'), 'fiber')
-        fiber_row = f'<div class="nr i1"><div class="nl"><span class="na">Dietary Fiber {fiber}g</span></div><div class="ndv">{dv("fiber")}%</div></div><div class="bt"></div>'
-
-    # Total sugars
-    sugars_row = ''
-    if present('total_sugars_g'):
-        ts = apply_fda_rounding(val('total_sugars_g'), 'total_sugars')
-        sugars_row = f'<div class="nr i1"><div class="nl"><span class="na">Total Sugars {ts}g</span></div><div class="ndv"></div></div><div class="bt"></div>'
-    else:
-        sugars_row = '<div class="nr i1"><div class="nl"><span class="na">Total Sugars ?g</span></div><div class="ndv"></div></div><div class="bt"></div>'
-
-    # Added sugars — ALWAYS show (mandatory FDA field)
-    if present('added_sugars_g'):
-        ads = apply_fda_rounding(val('added_sugars_g'), 'added_sugars')
-        added_sugars_row = f'<div class="nr i2"><div class="nl"><span class="na">Includes {ads}g Added Sugars</span></div><div class="ndv">{dv("added_sugars")}%</div></div><div class="bt"></div>'
-    elif present('total_sugars_g') and val('total_sugars_g') == '0.0':
-        added_sugars_row = '<div class="nr i2"><div class="nl"><span class="na">Includes 0g Added Sugars</span></div><div class="ndv">0%</div></div><div class="bt"></div>'
-    else:
-        added_sugars_row = '<div class="nr i2"><div class="nl"><span class="na required">Includes ?g Added Sugars ⚠</span></div><div class="ndv">?%</div></div><div class="bt"></div>'
-
-    # Servings display
-    spc_html = spc_display
-    if spc_display == '⚠ VERIFY':
-        spc_html = '<span style="color:#cc0000;font-weight:700;">⚠ VERIFY</span>'
-    elif spc_note:
-        spc_html = f'{spc_display} <span style="color:#cc0000;font-size:6pt;">*</span>'
-
-    return f"""<!DOCTYPE html>
+# Label page with str.format placeholders (CSS braces doubled); built once at
+# import, filled per call by generate_fda_label_html
+_LABEL_HTML = """<!DOCTYPE html>
 <html lang="en">
 <head>
 <meta charset="UTF-8">
@@ -509,29 +523,29 @@ def generate_fda_label_html(data: Dict, percent_dv: Dict,
   <div class="bm"></div>
   <div class="dvh">% Daily Value*</div>
   <div class="bt"></div>
-  <div class="nr"><div class="nl"><span class="nm">Total Fat</span> <span class="na">{total_fat}g</span></div><div class="ndv">{dv('total_fat')}%</div></div>
+  <div class="nr"><div class="nl"><span class="nm">Total Fat</span> <span class="na">{total_fat}g</span></div><div class="ndv">{dv_total_fat}%</div></div>
   <div class="bt"></div>
-  <div class="nr i1"><div class="nl"><span class="na">Saturated Fat {sat_fat}g</span></div><div class="ndv">{dv('saturated_fat')}%</div></div>
+  <div class="nr i1"><div class="nl"><span class="na">Saturated Fat {sat_fat}g</span></div><div class="ndv">{dv_saturated_fat}%</div></div>
   <div class="bt"></div>
   {trans_fat_row}
   {chol_row}
   <div class="bt"></div>
-  <div class="nr"><div class="nl"><span class="nm">Sodium</span> <span class="na">{sodium}mg</span></div><div class="ndv">{dv('sodium')}%</div></div>
+  <div class="nr"><div class="nl"><span class="nm">Sodium</span> <span class="na">{sodium}mg</span></div><div class="ndv">{dv_sodium}%</div></div>
   <div class="bt"></div>
-  <div class="nr"><div class="nl"><span class="nm">Total Carbohydrate</span> <span class="na">{total_carb}g</span></div><div class="ndv">{dv('total_carb')}%</div></div>
+  <div class="nr"><div class="nl"><span class="nm">Total Carbohydrate</span> <span class="na">{total_carb}g</span></div><div class="ndv">{dv_total_carb}%</div></div>
   <div class="bt"></div>
   {fiber_row}
   {sugars_row}
   {added_sugars_row}
   <div class="nr"><div class="nl"><span class="nm">Protein</span> <span class="na">{protein}g</span></div><div class="ndv"></div></div>
   <div class="bk"></div>
-  <div class="nr"><div class="nl"><span class="na">Vitamin D {vitamin_d}mcg</span></div><div class="ndv">{dv('vitamin_d')}%</div></div>
+  <div class="nr"><div class="nl"><span class="na">Vitamin D {vitamin_d}mcg</span></div><div class="ndv">{dv_vitamin_d}%</div></div>
   <div class="bt"></div>
-  <div class="nr"><div class="nl"><span class="na">Calcium {calcium}mg</span></div><div class="ndv">{dv('calcium')}%</div></div>
+  <div class="nr"><div class="nl"><span class="na">Calcium {calcium}mg</span></div><div class="ndv">{dv_calcium}%</div></div>
   <div class="bt"></div>
-  <div class="nr"><div class="nl"><span class="na">Iron {iron}mg</span></div><div class="ndv">{dv('iron')}%</div></div>
+  <div class="nr"><div class="nl"><span class="na">Iron {iron}mg</span></div><div class="ndv">{dv_iron}%</div></div>
   <div class="bt"></div>
-  <div class="nr"><div class="nl"><span class="na">Potassium {potassium}mg</span></div><div class="ndv">{dv('potassium')}%</div></div>
+  <div class="nr"><div class="nl"><span class="na">Potassium {potassium}mg</span></div><div class="ndv">{dv_potassium}%</div></div>
   <div class="bk"></div>
   <div class="fn">* The % Daily Value (DV) tells you how much a nutrient in a serving of food contributes to a daily diet. 2,000 calories a day is used for general nutrition advice.</div>
 </div>
@@ -539,6 +553,105 @@ def generate_fda_label_html(data: Dict, percent_dv: Dict,
 </html>"""
 
 
+def generate_fda_label_html(data: Dict, percent_dv: Dict,
+                             spc_display: str, spc_note: Optional[str],
+                             serving_size_display: str) -> str:
+
+    def val(key, default='0'):
+        v = data.get(key, default)
+        return v if v not in [None, '', 'null'] else default
+
+    def present(key):
+        return data.get(key) not in [None, 'null', 'None', '']
+
+    def dv(key):
+        return percent_dv.get(key, 0)
+
+    calories    = apply_fda_rounding(val('calories'), 'calories')
+    total_fat   = apply_fda_rounding(val('total_fat_g'), 'total_fat')
+    sat_fat     = apply_fda_rounding(val('saturated_fat_g'), 'saturated_fat')
+    cholesterol = apply_fda_rounding(val('cholesterol_mg'), 'cholesterol')
+    sodium      = apply_fda_rounding(val('sodium_mg'), 'sodium')
+    total_carb  = apply_fda_rounding(val('total_carb_g'), 'total_carb')
+    protein     = apply_fda_rounding(val('protein_g'), 'protein')
+    vitamin_d   = apply_fda_rounding(val('vitamin_d_mcg'), 'vitamin_d_mcg')
+    calcium     = apply_fda_rounding(val('calcium_mg'), 'calcium_mg')
+    iron        = apply_fda_rounding(val('iron_mg'), 'iron_mg')
+    potassium   = apply_fda_rounding(val('potassium_mg'), 'potassium_mg')
+
+    # Trans fat
+    trans_fat_row = ''
+    if present('trans_fat_g'):
+        tf = apply_fda_rounding(val('trans_fat_g'), 'trans_fat')
+        trans_fat_row = f'<div class="nr i1"><div class="nl"><span class="na"><em>Trans</em> Fat {tf}g</span></div><div class="ndv"></div></div><div class="bt"></div>'
+    else:
+        trans_fat_row = '<div class="nr i1"><div class="nl"><span class="na"><em>Trans</em> Fat ?g</span></div><div class="ndv"></div></div><div class="bt"></div>'
+
+    # Cholesterol
+    if present('cholesterol_mg'):
+        chol_row = f'<div class="nr"><div class="nl"><span class="nm">Cholesterol</span> <span class="na">{cholesterol}mg</span></div><div class="ndv">{dv("cholesterol")}%</div></div>'
+    else:
+        chol_row = '<div class="nr"><div class="nl"><span class="nm">Cholesterol</span> <span class="na">?mg</span></div><div class="ndv">?%</div></div>'
+
+    # Fiber
+    fiber_row = ''
+    if present('fiber_g'):
+        fiber = apply_fda_rounding(val('fiber_g'), 'fiber')
+        fiber_row = f'<div class="nr i1"><div class="nl"><span class="na">Dietary Fiber {fiber}g</span></div><div class="ndv">{dv("fiber")}%</div></div><div class="bt"></div>'
+
+    # Total sugars
+    sugars_row = ''
+    if present('total_sugars_g'):
+        ts = apply_fda_rounding(val('total_sugars_g'), 'total_sugars')
+        sugars_row = f'<div class="nr i1"><div class="nl"><span class="na">Total Sugars {ts}g</span></div><div class="ndv"></div></div><div class="bt"></div>'
+    else:
+        sugars_row = '<div class="nr i1"><div class="nl"><span class="na">Total Sugars ?g</span></div><div class="ndv"></div></div><div class="bt"></div>'
+
+    # Added sugars — ALWAYS show (mandatory FDA field)
+    if present('added_sugars_g'):
+        ads = apply_fda_rounding(val('added_sugars_g'), 'added_sugars')
+        added_sugars_row = f'<div class="nr i2"><div class="nl"><span class="na">Includes {ads}g Added Sugars</span></div><div class="ndv">{dv("added_sugars")}%</div></div><div class="bt"></div>'
+    elif present('total_sugars_g') and val('total_sugars_g') == '0.0':
+        added_sugars_row = '<div class="nr i2"><div class="nl"><span class="na">Includes 0g Added Sugars</span></div><div class="ndv">0%</div></div><div class="bt"></div>'
+    else:
+        added_sugars_row = '<div class="nr i2"><div class="nl"><span class="na required">Includes ?g Added Sugars ⚠</span></div><div class="ndv">?%</div></div><div class="bt"></div>'
+
+    # Servings display
+    spc_html = spc_display
+    if spc_display == '⚠ VERIFY':
+        spc_html = '<span style="color:#cc0000;font-weight:700;">⚠ VERIFY</span>'
+    elif spc_note:
+        spc_html = f'{spc_display} <span style="color:#cc0000;font-size:6pt;">*</span>'
+
+    return _LABEL_HTML.format_map({
+        'spc_html': spc_html,
+        'serving_size_display': serving_size_display,
+        'calories': calories,
+        'total_fat': total_fat,
+        'dv_total_fat': dv('total_fat'),
+        'sat_fat': sat_fat,
+        'dv_saturated_fat': dv('saturated_fat'),
+        'trans_fat_row': trans_fat_row,
+        'chol_row': chol_row,
+        'sodium': sodium,
+        'dv_sodium': dv('sodium'),
+        'total_carb': total_carb,
+        'dv_total_carb': dv('total_carb'),
+        'fiber_row': fiber_row,
+        'sugars_row': sugars_row,
+        'added_sugars_row': added_sugars_row,
+        'protein': protein,
+        'vitamin_d': vitamin_d,
+        'dv_vitamin_d': dv('vitamin_d'),
+        'calcium': calcium,
+        'dv_calcium': dv('calcium'),
+        'iron': iron,
+        'dv_iron': dv('iron'),
+        'potassium': potassium,
+        'dv_potassium': dv('potassium'),
+    })
+
+
 def html_to_pdf_base64(html: str) -> str:
     """Convert HTML label to PDF and return as base64 string."""
     try:
@@ -625,28 +738,31 @@ async def process_label_image(image_bytes: bytes, image_type: str) -> Dict:
     base64_image = base64.b64encode(image_bytes).decode('utf-8')
     image_data_url = f"data:{image_type};base64,{base64_image}"
 
-    response = openai.ChatCompletion.create(
-        model=MODEL,
-        messages=[
-            {"role": "system", "content": EXTRACTION_PROMPT},
-            {"role": "user", "content": [
-                {"type": "text", "text": "Extract all nutrition data from this LATAM label as JSON."},
-                {"type": "image_url", "image_url": {"url": image_data_url, "detail": "high"}}
-            ]}
-        ],
-        max_tokens=1500,
-        temperature=0.0
-    )
-
-    raw_text = response['choices'][0]['message']['content']
+    async with openai_semaphore:
+        response = await get_openai_client().chat.completions.create(
+            model=MODEL,
+            messages=[
+                {"role": "system", "content": EXTRACTION_PROMPT},
+                {"role": "user", "content": [
+                    {"type": "text", "text": "Extract all nutrition data from this LATAM label as JSON."},
+                    {"type": "image_url", "image_url": {"url": image_data_url, "detail": "high"}}
+                ]}
+            ],
+            max_tokens=1500,
+            temperature=0.0
+        )
+
+    raw_text = response.choices[0].message.content
     raw_text = raw_text.replace('```json', '').replace('```', '').strip()
-    extracted = json.loads(raw_text)
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError, so run_conversion
+    # maps a bad reply to the same 422 either way
+    extracted = orjson.loads(raw_text) if orjson else json.loads(raw_text)
 
     # 2. Validate and normalize numeric values
-    validated = validate_numeric_values(extracted)
+    validated, floats = validate_numeric_values(extracted)
 
     # 3. Convert Mexican vitamins if present
-    validated, vnr_notes = convert_mexican_vitamins(validated, extracted)
+    validated, vnr_notes = convert_mexican_vitamins(validated, extracted, floats)
 
     # 4. Build serving size display
     serving_size_display = build_serving_size_display(validated)
@@ -656,7 +772,7 @@ async def process_label_image(image_bytes: bytes, image_type: str) -> Dict:
     spc_display, spc_note = resolve_servings_per_container(validated)
 
     # 6. Calculate %DV
-    percent_dv = calculate_all_dv(validated)
+    percent_dv = calculate_all_dv(floats)
     validated['percent_dv'] = percent_dv
 
     # 7. Detect missing fields
@@ -683,8 +799,8 @@ async def process_label_image(image_bytes: bytes, image_type: str) -> Dict:
         validated, percent_dv, spc_display, spc_note, serving_size_display
     )
 
-    # 10. Generate PDF
-    pdf_b64 = html_to_pdf_base64(html)
+    # 10. Generate PDF (weasyprint is blocking — keep it off the event loop)
+    pdf_b64 = await asyncio.to_thread(html_to_pdf_base64, html)
 
     return {
         "validated_data": validated,
@@ -700,30 +816,8 @@ async def process_label_image(image_bytes: bytes, image_type: str) -> Dict:
     }
 
 
-# ============================================================================
-# ENDPOINTS
-# ============================================================================
-
-@app.get("/health")
-def health():
-    return {"status": "ok", "version": "1.0.0", "service": "VeriLabel API"}
-
-
-@app.post("/convert", response_model=ConversionResponse)
-async def convert_label(
-    file: UploadFile = File(...),
-    _: str = Depends(verify_api_key)
-):
-    """
-    Convert a LATAM label image to an FDA-compliant Nutrition Facts panel.
-    Returns JSON data, HTML label, and base64-encoded PDF.
-    
-    Use in n8n:
-      - HTTP Request node → POST /convert
-      - Header: X-API-Key: your_key
-      - Body: form-data, field name "file", attach image
-      - Response: parse json → use html_label or decode pdf_base64
-    """
+async def read_label_upload(file: UploadFile) -> bytes:
+    """Read an uploaded label image, rejecting unsupported types and oversized files"""
     if file.content_type not in ["image/jpeg", "image/png", "image/jpg"]:
         raise HTTPException(status_code=400, detail="Only JPG and PNG images supported")
 
@@ -731,17 +825,23 @@ async def convert_label(
 
     if len(image_bytes) > 10 * 1024 * 1024:
         raise HTTPException(status_code=400, detail="File too large — max 10MB")
+    return image_bytes
 
+
+async def run_conversion(image_bytes: bytes, image_type: str) -> Dict:
+    """process_label_image with pipeline failures mapped to HTTP errors"""
     try:
-        result = await process_label_image(image_bytes, file.content_type)
+        return await process_label_image(image_bytes, image_type)
     except json.JSONDecodeError:
         raise HTTPException(status_code=422, detail="Could not parse nutrition data from image")
-    except openai.error.OpenAIError as e:
+    except OpenAIError as e:
         raise HTTPException(status_code=502, detail=f"OpenAI error: {str(e)}")
     except Exception as e:
         logger.error(f"Conversion error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+
+def to_conversion_response(result: Dict) -> ConversionResponse:
     vd = result["validated_data"]
 
     return ConversionResponse(
@@ -760,6 +860,67 @@ async def convert_label(
     )
 
 
+# ============================================================================
+# ENDPOINTS
+# ============================================================================
+
+@app.get("/health")
+def health():
+    return {"status": "ok", "version": "1.0.0", "service": "VeriLabel API"}
+
+
+@app.post("/convert", response_model=ConversionResponse)
+async def convert_label(
+    file: UploadFile = File(...),
+    _: str = Depends(verify_api_key)
+):
+    """
+    Convert a LATAM label image to an FDA-compliant Nutrition Facts panel.
+    Returns JSON data, HTML label, and base64-encoded PDF.
+    
+    Use in n8n:
+      - HTTP Request node → POST /convert
+      - Header: X-API-Key: your_key
+      - Body: form-data, field name "file", attach image
+      - Response: parse json → use html_label or decode pdf_base64
+    """
+    image_bytes = await read_label_upload(file)
+    result = await run_conversion(image_bytes, file.content_type)
+    return to_conversion_response(result)
+
+
+@app.post("/convert/batch", response_model=List[BatchItem])
+async def convert_label_batch(
+    files: List[UploadFile] = File(...),
+    _: str = Depends(verify_api_key)
+):
+    """
+    Convert several label images in one request.
+
+    Labels are processed concurrently (at most OPENAI_CONCURRENCY vision calls
+    in flight), so a batch takes roughly as long as its slowest label rather
+    than the sum of all of them. One bad image doesn't fail the batch — each
+    item reports its own success/error.
+    """
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(status_code=400, detail=f"Too many files — max {MAX_BATCH_FILES} per batch")
+
+    async def convert_one(upload: UploadFile) -> BatchItem:
+        try:
+            image_bytes = await read_label_upload(upload)
+            result = await run_conversion(image_bytes, upload.content_type)
+            response = to_conversion_response(result)
+        except HTTPException as e:
+            return BatchItem(filename=upload.filename, success=False, result=None, error=e.detail)
+        except Exception as e:
+            # e.g. a ValidationError building the response; fail this item only
+            logger.error(f"Conversion error: {e}", exc_info=True)
+            return BatchItem(filename=upload.filename, success=False, result=None, error=str(e))
+        return BatchItem(filename=upload.filename, success=True, result=response, error=None)
+
+    return await asyncio.gather(*(convert_one(f) for f in files))
+
+
 @app.post("/audit", response_model=AuditResponse)
 async def audit_label(
     file: UploadFile = File(...),